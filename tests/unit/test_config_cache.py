@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from ttr.src import config_cache
+from ttr.src.config_cache import ConfigCache
+
+
+class DummyConfig:
+    loads = 0
+
+    def __init__(self, path, json_schema=None):
+        self.path = path
+        self.json_schema = json_schema
+
+    @classmethod
+    def from_file(cls, path, json_schema=None):
+        cls.loads += 1
+        return cls(path, json_schema=json_schema)
+
+
+@pytest.fixture()
+def config_file(tmp_path):
+    path = tmp_path / "config.toml"
+    path.write_text("[general]\n")
+    DummyConfig.loads = 0
+    return path
+
+
+# -------------------------------------------------------------
+# hits and misses
+# -------------------------------------------------------------
+def test_cache_hits(config_file):
+    cache = ConfigCache(DummyConfig)
+    with cache.installed():
+        first = DummyConfig.from_file(config_file, json_schema={})
+        second = DummyConfig.from_file(str(config_file), json_schema={})
+
+    assert first is second
+    assert DummyConfig.loads == 1
+    assert cache.report() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+# -------------------------------------------------------------
+# invalidation on mtime and arguments
+# -------------------------------------------------------------
+def test_cache_invalidation(config_file):
+    cache = ConfigCache(DummyConfig)
+    with cache.installed():
+        first = DummyConfig.from_file(config_file)
+        stat = config_file.stat()
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        second = DummyConfig.from_file(config_file)
+        third = DummyConfig.from_file(config_file, json_schema={})
+
+    assert first is not second
+    assert second is not third
+    assert cache.misses == 3
+
+
+# -------------------------------------------------------------
+# missing files and uninstall
+# -------------------------------------------------------------
+def test_cache_uninstall(tmp_path):
+    cache = ConfigCache(DummyConfig)
+    with cache.installed():
+        DummyConfig.from_file(tmp_path / "missing.toml")
+        DummyConfig.from_file(tmp_path / "missing.toml")
+
+    assert cache.report() == {"hits": 0, "misses": 2, "entries": 0}
+
+    DummyConfig.from_file(tmp_path / "missing.toml")
+    assert cache.misses == 2
+
+
+# -------------------------------------------------------------
+# positional arguments
+# -------------------------------------------------------------
+def test_cache_positional(config_file):
+    cache = ConfigCache(DummyConfig)
+    with cache.installed():
+        first = DummyConfig.from_file(config_file, {})
+        second = DummyConfig.from_file(config_file, {})
+        third = DummyConfig.from_file(config_file, json_schema={})
+
+    assert first is second
+    assert first.json_schema == {}
+    assert third is not first
+    assert cache.report() == {"hits": 1, "misses": 2, "entries": 2}
+
+
+# -------------------------------------------------------------
+# base configurations as used by the case command
+# -------------------------------------------------------------
+def test_cache_case_path(config_file):
+    cache = ConfigCache(DummyConfig)
+    base = f"?{config_file.with_suffix('')}"
+    with cache.installed():
+        first = DummyConfig.from_file(base)
+        second = DummyConfig.from_file(base)
+        third = DummyConfig.from_file(config_file)
+
+    assert first is second
+    assert third is first
+    assert cache.report() == {"hits": 2, "misses": 1, "entries": 1}
+
+
+# -------------------------------------------------------------
+# invalidation on include files
+# -------------------------------------------------------------
+def test_cache_includes(config_file):
+    include = config_file.parent / "include.toml"
+    include.write_text("[domain]\n")
+    config_file.write_text('[include]\n  domain = "include.toml"\n')
+
+    cache = ConfigCache(DummyConfig)
+    with cache.installed():
+        first = DummyConfig.from_file(config_file)
+        stat = include.stat()
+        os.utime(include, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        second = DummyConfig.from_file(config_file)
+
+    assert first is not second
+    assert cache.misses == 2
+
+
+# -------------------------------------------------------------
+# hits do not parse the files again
+# -------------------------------------------------------------
+def test_cache_hits_without_parsing(monkeypatch, config_file):
+    include = config_file.parent / "include.toml"
+    include.write_text("[domain]\n")
+    config_file.write_text('[include]\n  domain = "include.toml"\n')
+
+    loads = []
+    toml_load = config_cache.tomli.load
+
+    def counting_load(f):
+        loads.append(f.name)
+        return toml_load(f)
+
+    monkeypatch.setattr(config_cache.tomli, "load", counting_load)
+    cache = ConfigCache(DummyConfig)
+    with cache.installed():
+        for _ in range(10):
+            DummyConfig.from_file(config_file)
+
+    assert cache.report() == {"hits": 9, "misses": 1, "entries": 1}
+    assert len(loads) == 2
@@ -0,0 +1,205 @@
+import json
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from ttr.src import invoke
+from ttr.src.invoke import Invoker
+
+
+class Flaky:
+    """Fail a number of times before succeeding."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, cmd):  # noqa ARG002
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError("Transient failure")
+
+
+def hang(cmd):  # noqa ARG001
+    time.sleep(10)
+
+
+# -------------------------------------------------------------
+# timeouts
+# -------------------------------------------------------------
+def test_timeout_lookup():
+    invoker = Invoker(
+        {"timeout": {"configure": 10, "start": 20, "tasks": {"Forecast": 30}}}
+    )
+    assert invoker.timeout("configure") == 10
+    assert invoker.timeout("start", "Pgd") == 20
+    assert invoker.timeout("start", "Forecast") == 30
+    assert Invoker().timeout("start") is None
+
+
+def test_timeout():
+    invoker = Invoker({"timeout": {"start": 0.2}})
+    start = time.monotonic()
+    assert not invoker.run(hang, ["foo"], "start", "case")
+    assert time.monotonic() - start < 5
+    assert invoker.attempts[0]["status"] == "timeout"
+    assert invoker.report()["failed"] == ["start:case"]
+
+
+def test_forked_failure():
+    invoker = Invoker({"timeout": {"start": 5}, "retries": 2, "backoff": 0})
+    assert not invoker.run(Flaky(1), ["foo"], "start", "case")
+    assert [x["status"] for x in invoker.attempts] == ["failed"] * 3
+
+
+def test_forked_transient(tmp_path):
+    marker = tmp_path / "marker"
+
+    def fail_once(cmd):  # noqa ARG001
+        if not marker.exists():
+            marker.touch()
+            raise OSError("Transient failure")
+
+    invoker = Invoker({"timeout": {"start": 5}, "retries": 1, "backoff": 0})
+    assert invoker.run(fail_once, ["foo"], "start", "case")
+    assert [x["status"] for x in invoker.attempts] == ["failed", "ok"]
+
+
+def test_forked_not_retryable():
+    def fail(cmd):
+        raise KeyError(cmd)
+
+    invoker = Invoker({"timeout": {"start": 5}, "retries": 2, "backoff": 0})
+    assert not invoker.run(fail, ["foo"], "start", "case")
+    assert len(invoker.attempts) == 1
+
+
+def is_running(pid):
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except FileNotFoundError:
+        return False
+    return stat.rsplit(")", 1)[1].split()[0] != "Z"
+
+
+def test_timeout_kills_process_group(monkeypatch, tmp_path):
+    monkeypatch.setattr(invoke, "KILL_WAIT", 0.5)
+    pid_file = tmp_path / "pid"
+
+    def launcher(cmd):  # noqa ARG001
+        proc = subprocess.Popen(["sleep", "30"])  # noqa S603 S607
+        pid_file.write_text(str(proc.pid))
+        proc.wait()
+
+    invoker = Invoker({"timeout": {"start": 0.5}})
+    assert not invoker.run(launcher, ["foo"], "start", "case")
+
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not is_running(pid)
+
+
+def test_interrupt_kills_process_group(monkeypatch, tmp_path):
+    monkeypatch.setattr(invoke, "KILL_WAIT", 0.5)
+    pid_file = tmp_path / "pid"
+    reap = Invoker.reap
+    interrupted = []
+
+    def launcher(cmd):  # noqa ARG001
+        proc = subprocess.Popen(["sleep", "30"])  # noqa S603 S607
+        (tmp_path / "pid.tmp").write_text(str(proc.pid))
+        (tmp_path / "pid.tmp").rename(pid_file)
+        proc.wait()
+
+    def interrupt(pid, timeout):
+        # Simulate Ctrl-C once the launcher has started
+        if pid_file.exists() and len(interrupted) == 0:
+            interrupted.append(pid)
+            raise KeyboardInterrupt
+        return reap(pid, timeout)
+
+    monkeypatch.setattr(Invoker, "reap", staticmethod(interrupt))
+    invoker = Invoker({"timeout": {"start": 30}})
+    with pytest.raises(KeyboardInterrupt):
+        invoker.run(launcher, ["foo"], "start", "case")
+
+    assert not is_running(interrupted[0])
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not is_running(pid)
+
+
+# -------------------------------------------------------------
+# retries
+# -------------------------------------------------------------
+@pytest.mark.parametrize(("failures", "success"), [(0, True), (2, True), (3, False)])
+def test_retries(monkeypatch, failures, success):
+    delays = []
+    monkeypatch.setattr(time, "sleep", delays.append)
+    func = Flaky(failures)
+    invoker = Invoker({"retries": 2, "backoff": 1})
+
+    assert invoker.run(func, ["foo"], "configure", "case") == success
+    assert func.calls == min(failures + 1, 3)
+    assert delays == [1, 2][: func.calls - 1]
+    assert [x["attempt"] for x in invoker.attempts] == list(range(1, func.calls + 1))
+
+
+def test_not_retryable(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda x: None)  # noqa ARG005
+
+    def fail(cmd):
+        raise KeyError(cmd)
+
+    invoker = Invoker({"retries": 2})
+    assert not invoker.run(fail, ["foo"], "configure", "case")
+    assert len(invoker.attempts) == 1
+
+    invoker = Invoker({"retries": 2, "retry_on": ["KeyError"]})
+    assert not invoker.run(fail, ["foo"], "configure", "case")
+    assert len(invoker.attempts) == 3
+
+    with pytest.raises(ValueError, match=r"Unknown exception Foo.*"):
+        Invoker({"retry_on": ["Foo"]})
+
+
+@pytest.mark.parametrize(("code", "success"), [(0, True), (None, True), (2, False)])
+def test_system_exit(code, success):
+    def leave(cmd):  # noqa ARG001
+        raise SystemExit(code)
+
+    invoker = Invoker({"retries": 1, "backoff": 0})
+    assert invoker.run(leave, ["foo"], "configure", "case") == success
+    assert len(invoker.attempts) == 1
+
+
+# -------------------------------------------------------------
+# stragglers and history
+# -------------------------------------------------------------
+def test_stragglers(tmp_path):
+    history = tmp_path / "history.json"
+    history.write_text(json.dumps({"start:case:Forecast": [0.001, 0.001, 0.001]}))
+    invoker = Invoker({"history": str(history)})
+
+    def forecast(cmd):  # noqa ARG001
+        time.sleep(0.05)
+
+    assert invoker.run(forecast, [], "start", "case", "Forecast")
+    assert invoker.report()["stragglers"] == ["start:case:Forecast"]
+
+    invoker.save_history()
+    assert len(json.loads(history.read_text())["start:case:Forecast"]) == 4
+
+
+def test_stragglers_in_run():
+    invoker = Invoker()
+    for case in ["a", "b", "c"]:
+        invoker.run(lambda cmd: None, [], "configure", case)  # noqa ARG005
+    assert invoker.median("configure:d", "configure") is not None
+    assert invoker.report()["invocations"] == 3
@@ -0,0 +1,94 @@
+import pytest
+
+from ttr.src.monitor import (
+    ABORTED,
+    COMPLETE,
+    QUEUED,
+    RUNNING,
+    FileStatusBackend,
+    RunMonitor,
+    StatusBackend,
+    get_backend,
+    write_status,
+)
+
+
+class SequenceBackend(StatusBackend):
+    """Backend returning a predefined sequence of states."""
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.polls = []
+
+    def poll(self, names):
+        self.polls.append(list(names))
+        states = self.sequence.pop(0)
+        return {name: states[name] for name in names}
+
+
+# -------------------------------------------------------------
+# file backend
+# -------------------------------------------------------------
+def test_file_backend(tmp_path):
+    write_status(tmp_path, "a", RUNNING)
+    write_status(tmp_path, "b", COMPLETE)
+    (tmp_path / "c.status").write_text("garbage\n")
+
+    backend = FileStatusBackend(tmp_path)
+    states = backend.poll(["a", "b", "c", "d"])
+
+    assert states == {"a": RUNNING, "b": COMPLETE, "c": QUEUED, "d": QUEUED}
+
+
+# -------------------------------------------------------------
+# durations from the status files
+# -------------------------------------------------------------
+def test_file_backend_times(tmp_path):
+    write_status(tmp_path, "a", COMPLETE, 100.0, 160.5)
+    write_status(tmp_path, "b", RUNNING, 100.0)
+    write_status(tmp_path, "c", ABORTED)
+
+    backend = FileStatusBackend(tmp_path)
+    assert backend.times(["a", "b", "c"]) == {"a": (100.0, 160.5), "b": (100.0, None)}
+
+    summary = RunMonitor({"case": ["a", "c"]}, backend, interval=0).run()
+    assert summary["a"]["duration"] == 60.5
+    assert summary["c"]["state"] == ABORTED
+
+
+# -------------------------------------------------------------
+# get_backend
+# -------------------------------------------------------------
+def test_get_backend(tmp_path):
+    assert isinstance(get_backend("file", directory=tmp_path), FileStatusBackend)
+    with pytest.raises(ValueError, match=r"Unknown status backend foo.*"):
+        get_backend("foo")
+
+
+# -------------------------------------------------------------
+# monitor
+# -------------------------------------------------------------
+def test_monitor():
+    backend = SequenceBackend(
+        [
+            {"a": QUEUED, "b": RUNNING},
+            {"a": RUNNING, "b": COMPLETE},
+            {"a": ABORTED},
+        ]
+    )
+    monitor = RunMonitor({"case": ["a", "b"]}, backend, interval=0)
+    summary = monitor.run()
+
+    assert backend.polls == [["a", "b"], ["a", "b"], ["a"]]
+    assert summary["a"]["state"] == ABORTED
+    assert summary["b"]["state"] == COMPLETE
+    assert summary["b"]["duration"] is not None
+    assert monitor.counts()[ABORTED] == 1
+
+
+def test_monitor_timeout():
+    backend = SequenceBackend([{"a": QUEUED}] * 10)
+    monitor = RunMonitor({"case": ["a"]}, backend, interval=0, timeout=0)
+    summary = monitor.run()
+
+    assert summary["a"] == {"case": "case", "state": QUEUED, "duration": None}
@@ -0,0 +1,81 @@
+import pytest
+
+from ttr.src.selection import CaseIndex
+
+
+@pytest.fixture()
+def cases():
+    return {
+        "cy49t2_alaro": {},
+        "cy49t2_alaro_target": {"host": "cy49t2_alaro"},
+        "cy49t2_arome_gnu_R32": {
+            "base": "cy49t2_arome",
+            "compiler": "gnu",
+            "precision": "R32",
+        },
+        "cy49t2_arome_intel_R64": {
+            "base": "cy49t2_arome",
+            "compiler": "intel",
+            "precision": "R64",
+        },
+        "gnu_cy48t3_arome": {"base": "cy48t3_arome", "subtag": "gnu_"},
+        "gnu_cy48t3_arome_target": {
+            "base": "cy48t3_arome_target",
+            "host": "gnu_cy48t3_arome",
+            "subtag": "gnu_",
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("cy49t2_alaro*", ["cy49t2_alaro", "cy49t2_alaro_target"]),
+        ("base=cy49t2_arome precision=R32", ["cy49t2_arome_gnu_R32"]),
+        ("compiler=gnu *_target", ["gnu_cy48t3_arome_target"]),
+        ("subtag=gnu_ !*_target", ["gnu_cy48t3_arome"]),
+        (
+            "compiler=intel, host=cy49t2_*",
+            ["cy49t2_alaro_target", "cy49t2_arome_intel_R64"],
+        ),
+        (
+            "*_target +hosts",
+            [
+                "cy49t2_alaro",
+                "cy49t2_alaro_target",
+                "gnu_cy48t3_arome",
+                "gnu_cy48t3_arome_target",
+            ],
+        ),
+        ("foo", []),
+    ],
+)
+def test_select(cases, expression, expected):
+    assert CaseIndex(cases).select(expression) == expected
+
+
+def test_select_all(cases):
+    assert CaseIndex(cases).select("*") == list(cases)
+    assert CaseIndex(cases).select("cy49t2_alaro,") == ["cy49t2_alaro"]
+
+
+@pytest.mark.parametrize("expression", ["", " , ", "+hosts"])
+def test_select_no_terms(cases, expression):
+    with pytest.raises(ValueError, match=r"The selection .* has no terms.*"):
+        CaseIndex(cases).select(expression)
+
+
+def test_select_within_selection(cases):
+    index = CaseIndex(cases, ["gnu_cy48t3_arome_target", "cy49t2_alaro_target"])
+    assert index.select("compiler=gnu") == ["gnu_cy48t3_arome_target"]
+    assert index.select("*_target +hosts") == [
+        "cy49t2_alaro",
+        "cy49t2_alaro_target",
+        "gnu_cy48t3_arome",
+        "gnu_cy48t3_arome_target",
+    ]
+
+
+def test_select_unknown_attribute(cases):
+    with pytest.raises(ValueError, match=r"Unknown selection attribute foo.*"):
+        CaseIndex(cases).select("foo=bar")
@@ -0,0 +1,103 @@
+import hashlib
+
+import pytest
+
+from ttr.src.staging import MANIFEST, STAMP, DataStager, file_hash, read_manifest
+
+
+@pytest.fixture()
+def source(tmp_path):
+    dataset = tmp_path / "source" / "cy49t2_alaro"
+    (dataset / "clim").mkdir(parents=True)
+    files = {"ICMSHHARM+0000": b"initial", "clim/Const.Clim": b"climate"}
+    lines = []
+    for name, data in files.items():
+        (dataset / name).write_bytes(data)
+        lines.append(f"{hashlib.sha256(data).hexdigest()}  {name}\n")
+    (dataset / MANIFEST).write_text("".join(lines))
+    return tmp_path / "source"
+
+
+# -------------------------------------------------------------
+# hashing and manifest
+# -------------------------------------------------------------
+def test_file_hash(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"x" * 1000)
+    assert file_hash(path, chunk_size=7) == hashlib.sha256(b"x" * 1000).hexdigest()
+
+
+def test_read_manifest(source):
+    manifest = read_manifest(source / "cy49t2_alaro" / MANIFEST)
+    assert set(manifest) == {"ICMSHHARM+0000", "clim/Const.Clim"}
+
+
+# -------------------------------------------------------------
+# staging
+# -------------------------------------------------------------
+@pytest.mark.parametrize("link", [False, True])
+def test_stage(source, tmp_path, link):
+    stager = DataStager(source, tmp_path / "cache", workers=2, link=link)
+    paths = stager.stage(["cy49t2_alaro"])
+
+    cached = paths["cy49t2_alaro"]
+    assert (cached / "clim" / "Const.Clim").read_bytes() == b"climate"
+    assert (cached / STAMP).is_file()
+    assert stager.is_cached("cy49t2_alaro", stager.files("cy49t2_alaro"))
+
+
+def test_stage_reuse(source, tmp_path, monkeypatch):
+    stager = DataStager(source, tmp_path / "cache")
+    stager.stage(["cy49t2_alaro"])
+
+    def fail(*args):  # noqa ARG001
+        raise AssertionError("Cached data should be reused")
+
+    monkeypatch.setattr(stager, "stage_file", fail)
+    stager.stage(["cy49t2_alaro"])
+
+
+def test_stage_corrupt_cache(source, tmp_path):
+    stager = DataStager(source, tmp_path / "cache")
+    paths = stager.stage(["cy49t2_alaro"])
+
+    cached = paths["cy49t2_alaro"] / "clim" / "Const.Clim"
+    cached.write_bytes(b"CLIMATE")
+    assert not stager.is_cached("cy49t2_alaro", stager.files("cy49t2_alaro"))
+
+    stager.stage(["cy49t2_alaro"])
+    assert cached.read_bytes() == b"climate"
+
+
+def test_stage_outside(source, tmp_path):
+    manifest = source / "cy49t2_alaro" / MANIFEST
+    manifest.write_text(manifest.read_text() + "0000  ../../outside\n")
+    stager = DataStager(source, tmp_path / "cache")
+    with pytest.raises(ValueError, match=r"Paths outside the data set.*"):
+        stager.stage(["cy49t2_alaro"])
+
+
+def test_stage_corrupt(source, tmp_path):
+    (source / "cy49t2_alaro" / "ICMSHHARM+0000").write_bytes(b"corrupt")
+    stager = DataStager(source, tmp_path / "cache")
+    with pytest.raises(ValueError, match=r"Checksum mismatch.*"):
+        stager.stage(["cy49t2_alaro"])
+
+
+def test_stage_missing(source, tmp_path):
+    stager = DataStager(source, tmp_path / "cache")
+    with pytest.raises(FileNotFoundError, match=r"Test data .* not found"):
+        stager.stage(["cy49t2_alaro", "foo"])
+    assert not (tmp_path / "cache").exists()
+
+    (source / "cy49t2_alaro" / "clim" / "Const.Clim").unlink()
+    with pytest.raises(FileNotFoundError, match=r"Missing test data.*"):
+        stager.stage(["cy49t2_alaro"])
+
+
+def test_stage_without_manifest(source, tmp_path):
+    (source / "cy49t2_alaro" / MANIFEST).unlink()
+    stager = DataStager(source, tmp_path / "cache")
+    paths = stager.stage(["cy49t2_alaro"])
+    assert (paths["cy49t2_alaro"] / "ICMSHHARM+0000").is_file()
+    assert not (paths["cy49t2_alaro"] / STAMP).exists()
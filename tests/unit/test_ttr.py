@@ -54,6 +54,8 @@ class DummyArgs:
     run = False
     list = False
     prepare_binaries = False
+    watch = False
+    select = None
 
 
 @pytest.fixture()
@@ -192,6 +194,22 @@ def test_expand_tests(args):
     assert "baar_gnu_dp" in tc.cases
 
 
+# -------------------------------------------------------------
+# select
+# -------------------------------------------------------------
+def test_select(monkeypatch, args):
+    monkeypatch.setattr(args, "select", "*_target +hosts")
+    tc = TestCases(args)
+
+    assert tc.selection == ["alaro", "alaro_target"]
+
+
+def test_select_nothing(monkeypatch, args):
+    monkeypatch.setattr(args, "select", "no_such_case")
+    with pytest.raises(ValueError, match="matched no cases"):
+        TestCases(args)
+
+
 # -------------------------------------------------------------
 # list
 # -------------------------------------------------------------
@@ -238,6 +256,28 @@ def test_update_hostname(args):
     assert tc.cases["foo"]["hostdomain"] == hostnames["baar"]["domain_name"]
 
 
+# -------------------------------------------------------------
+# replace_macros
+# -------------------------------------------------------------
+def test_replace_macros():
+    data = {
+        "times": {"start": f"-P{ttr.CASE_MACROS['counter']}D"},
+        "ecfvars": {"case_prefix": f"x_{ttr.CASE_MACROS['subtag']}"},
+        "list": [ttr.CASE_MACROS["host_case"], 1],
+    }
+    macros = {
+        ttr.CASE_MACROS["counter"]: 3,
+        ttr.CASE_MACROS["subtag"]: "gnu_",
+        ttr.CASE_MACROS["host_case"]: "foo",
+    }
+
+    result = ttr.replace_macros(data, macros)
+    assert result["times"]["start"] == "-P3D"
+    assert result["ecfvars"]["case_prefix"] == "x_gnu_"
+    assert result["list"] == ["foo", 1]
+    assert data["times"]["start"] == f"-P{ttr.CASE_MACROS['counter']}D"
+
+
 # -------------------------------------------------------------
 # create and configure
 # -------------------------------------------------------------
@@ -252,6 +292,104 @@ def test_create_and_configure(monkeypatch, args, tmp_test_data_dir):
     os.chdir(basedir)
 
 
+# -------------------------------------------------------------
+# create with per case macros
+# -------------------------------------------------------------
+@pytest.mark.usefixtures("_mockers")
+def test_create_modifs(monkeypatch, args, tmp_path):
+    config_path = tmp_path / "macro_config.toml"
+    config_path.write_text(
+        """
+        [general]
+        [macros.select.default]
+          gen_macros = []
+          group_macros = ["modif_macros"]
+          os_macros = []
+        [modifs.general.times]
+          start = "-P@COUNTER@D"
+        [modifs.scheduler.ecfvars]
+          case_prefix = "@TAG@@SUBTAG@"
+        [modifs.suite_control]
+          host_case = "@HOST_CASE@"
+          host_domain = "@HOST_DOMAIN@"
+        [cases.alaro]
+          subtag = "gnu_"
+        [cases.alaro.modifs.system]
+          case_suffix = "_@SUBTAG@@COUNTER@"
+        [cases.alaro_target]
+          host = "alaro"
+          hostname = "foo"
+          hostdomain = "bar"
+        """
+    )
+    monkeypatch.setattr(args, "config_file", config_path)
+    monkeypatch.chdir(tmp_path)
+    tc = TestCases(args)
+    tc.create()
+
+    with open(f"{tc.test_dir}/modifs_alaro.toml") as f:
+        alaro = tomlkit.load(f)
+    with open(f"{tc.test_dir}/modifs_alaro_target.toml") as f:
+        target = tomlkit.load(f)
+
+    assert alaro["general"]["times"]["start"] == "-P1D"
+    assert alaro["scheduler"]["ecfvars"]["case_prefix"] == "x_gnu_"
+    assert alaro["system"]["case_suffix"] == "_gnu_1"
+    assert alaro["suite_control"]["host_case"] == ""
+    assert target["general"]["times"]["start"] == "-P1D"
+    assert target["scheduler"]["ecfvars"]["case_prefix"] == "x_"
+    assert target["suite_control"]["host_case"] == "foo"
+    assert target["suite_control"]["host_domain"] == "bar"
+
+
+# -------------------------------------------------------------
+# configure with a failing host
+# -------------------------------------------------------------
+@pytest.mark.usefixtures("_mockers")
+def test_failing_host(monkeypatch, args, tmp_path):
+    def fail(cmd):
+        raise KeyError(cmd)
+
+    monkeypatch.setattr(ttr, "tactus_main", fail)
+    monkeypatch.chdir(tmp_path)
+    tc = TestCases(args)
+    tc.selection = ["alaro_target"]
+    tc.create(tc.prepare())
+    tc.update_hostnames(tc.configure(config_hosts=True))
+    tc.create()
+
+    assert tc.failed == {"alaro", "alaro_target"}
+    assert "alaro_target" not in tc.cmds
+
+
+# -------------------------------------------------------------
+# stage_data
+# -------------------------------------------------------------
+def test_stage_data(args, tmp_path):
+    (tmp_path / "source" / "foo").mkdir(parents=True)
+    (tmp_path / "source" / "foo" / "bar").write_text("baar")
+    tc = TestCases(args)
+    tc.mode = "task"
+    tc.staging = {
+        "active": True,
+        "source": str(tmp_path / "source"),
+        "cache": str(tmp_path / "cache"),
+    }
+    tc.selection = ["foo"]
+    system = {
+        "case_data": "@TEST_DATA_PATH@/foo",
+        "climdir": "@TEST_DATA_PATH@/foo/clim",
+        "intp_bddir": "@CASE_DATA@/bd",
+    }
+    tc.cases = {"foo": {"modifs": {"system": system}}}
+    tc.stage_data()
+
+    assert system["case_data"] == str((tmp_path / "cache" / "foo").resolve())
+    assert system["climdir"] == str((tmp_path / "cache" / "foo" / "clim").resolve())
+    assert system["intp_bddir"] == "@CASE_DATA@/bd"
+    assert (tmp_path / "cache" / "foo" / "bar").is_file()
+
+
 # -------------------------------------------------------------
 # start
 # -------------------------------------------------------------
@@ -265,6 +403,73 @@ def test_start(args):
     tc.start()
 
 
+# -------------------------------------------------------------
+# start and watch in task mode
+# -------------------------------------------------------------
+def test_start_and_watch(monkeypatch, args, tmp_path):
+    monkeypatch.setattr(ttr, "tactus_main", lambda cmd: None)  # noqa ARG005
+    tc = TestCases(args)
+    tc.mode = "task"
+    tc.cmds = {"foo": ["foo"]}
+    tc.cases = {"foo": {"config_name": "bar", "tasks": ["Pgd", "Forecast"]}}
+    tc.test_dir = str(tmp_path)
+    tc.watch_settings = {"interval": 0}
+    tc.start()
+
+    assert (tmp_path / ttr.RUN_FILE).is_file()
+    assert (tmp_path / "Forecast.bar.status").read_text().split()[0] == "complete"
+    assert tc.watch()
+
+
+def test_watch_unfinished(args, tmp_path):
+    tc = TestCases(args)
+    tc.mode = "task"
+    tc.test_dir = str(tmp_path)
+    tc.watch_settings = {"interval": 0, "timeout": 0}
+    (tmp_path / ttr.RUN_FILE).write_text('{"mode": "task", "runs": {"foo": ["bar"]}}')
+
+    assert not tc.watch()
+
+
+def test_start_interrupted(monkeypatch, args, tmp_path):
+    def interrupt(cmd):  # noqa ARG001
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(ttr, "tactus_main", interrupt)
+    tc = TestCases(args)
+    tc.mode = "task"
+    tc.cmds = {"foo": ["foo"]}
+    tc.cases = {"foo": {"config_name": "bar", "tasks": ["Pgd", "Forecast"]}}
+    tc.test_dir = str(tmp_path)
+    with pytest.raises(KeyboardInterrupt):
+        tc.start()
+
+    assert (tmp_path / "Pgd.bar.status").read_text().split()[0] == "aborted"
+    assert (tmp_path / "Forecast.bar.status").read_text().strip() == "aborted"
+
+
+# -------------------------------------------------------------
+# start with a failing task
+# -------------------------------------------------------------
+def test_start_failing_task(monkeypatch, args, tmp_path):
+    def fail(cmd):
+        raise OSError(f"{cmd} failed")
+
+    monkeypatch.setattr(ttr, "tactus_main", fail)
+    tc = TestCases(args)
+    tc.mode = "task"
+    tc.cmds = {"foo": ["foo"]}
+    tc.cases = {"foo": {"config_name": "bar", "tasks": ["Pgd", "Forecast"]}}
+    tc.test_dir = str(tmp_path)
+    tc.start()
+
+    pgd = (tmp_path / "Pgd.bar.status").read_text().split()
+    assert pgd[0] == "aborted"
+    assert float(pgd[2]) >= float(pgd[1])
+    assert (tmp_path / "Forecast.bar.status").read_text().strip() == "aborted"
+    assert tc.invoker.report()["failed"] == ["start:foo:Pgd"]
+
+
 # -------------------------------------------------------------
 # main
 # -------------------------------------------------------------
@@ -275,3 +480,14 @@ def test_main(monkeypatch, tmp_test_data_dir, args):
     monkeypatch.setattr(ttr, "tactus_main", dump_toml)
     ttr_main(["-d", "-c", str(args.config_file)])
     os.chdir(basedir)
+
+
+@pytest.mark.usefixtures("_mockers")
+def test_main_failing_case(monkeypatch, tmp_test_data_dir, args):
+    basedir = os.getcwd()
+    os.chdir(tmp_test_data_dir)
+    monkeypatch.setattr(ttr, "tactus_main", dump_toml)
+    monkeypatch.setattr(TestCases, "report", lambda self: self.failed.add("foo"))
+    with pytest.raises(SystemExit):
+        ttr_main(["-d", "-c", str(args.config_file)])
+    os.chdir(basedir)
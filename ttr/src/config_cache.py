@@ -0,0 +1,190 @@
+"""In-process cache of parsed config files."""
+import contextlib
+import inspect
+from pathlib import Path
+
+import tomli
+
+
+class ConfigCache:
+    """Memoize a config file loader during a ttr run.
+
+    The cache wraps a ``from_file`` like classmethod, e.g.
+    ``ParsedConfig.from_file``, and stores the parsed objects keyed by
+    the resolved path, the modification times of the file and of the
+    files in its ``[include]`` section, and the arguments used. The parsed
+    configs are immutable, so the same object can safely be handed out to
+    all callers, including the repeated tactus_main calls made for each
+    case.
+
+    Paths given as ``?<path>`` and paths without the ``.toml`` suffix, as
+    used for the base configurations in the ``case`` command, are keyed
+    on the resolved toml file. Include files are resolved relative to the
+    including file only; includes found through the config search paths
+    are not part of the key.
+    """
+
+    def __init__(self, owner, name="from_file"):
+        """Construct the object.
+
+        Arguments:
+            owner (class): Class owning the loader
+            name (str, optional): Name of the loader classmethod
+
+        """
+        self.owner = owner
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._store = {}
+        self._includes = {}
+
+    @staticmethod
+    def resolve(path):
+        """Resolve the config file a path refers to.
+
+        Arguments:
+            path (str|Path): Path to config file
+
+        Returns:
+            path (Path): Resolved path
+        """
+        path = Path(str(path).lstrip("?")).expanduser().resolve()
+        if path.suffix == "" and not path.is_file():
+            path = path.with_suffix(".toml")
+        return path
+
+    def includes(self, path, mtime):
+        """Get the include files of a config file.
+
+        The includes are memoized per file and modification time, so only
+        a changed file is parsed again.
+
+        Arguments:
+            path (Path): Resolved path to config file
+            mtime (int): Modification time of the file in ns
+
+        Returns:
+            includes (list): Resolved paths of the existing include files
+        """
+        if (path, mtime) in self._includes:
+            return self._includes[(path, mtime)]
+
+        with open(path, "rb") as f:
+            section = tomli.load(f).get("include", {})
+        includes = []
+        for include in section.values() if isinstance(section, dict) else []:
+            if not isinstance(include, str):
+                continue
+            include_path = (path.parent / include).resolve()
+            if include_path.is_file():
+                includes.append(include_path)
+        self._includes[(path, mtime)] = includes
+        return includes
+
+    def mtimes(self, path, visited=None):
+        """Get the modification times of a config file and its includes.
+
+        Arguments:
+            path (Path): Resolved path to config file
+            visited (set, optional): Files already visited
+
+        Returns:
+            mtimes (list): Path and modification time per file
+        """
+        visited = set() if visited is None else visited
+        visited.add(path)
+        mtime = path.stat().st_mtime_ns
+        mtimes = [(str(path), mtime)]
+        if path.suffix != ".toml":
+            return mtimes
+
+        for include_path in self.includes(path, mtime):
+            if include_path not in visited:
+                mtimes += self.mtimes(include_path, visited)
+        return mtimes
+
+    def key(self, config_class, path, args, kwargs):
+        """Build the cache key for a config file.
+
+        Arguments:
+            config_class (class): Class the loader is called for
+            path (str|Path): Path to config file
+            args (tuple): Positional arguments to the loader
+            kwargs (dict): Keyword arguments to the loader
+
+        Returns:
+            key (tuple): Cache key
+
+        """
+        mtimes = self.mtimes(self.resolve(path))
+        return (config_class, tuple(mtimes), repr(args), repr(sorted(kwargs.items())))
+
+    def load(self, loader, config_class, path, *args, **kwargs):
+        """Load a config file, reusing a previously parsed one if possible.
+
+        Arguments:
+            loader (classmethod): The original loader
+            config_class (class): Class the loader is called for
+            path (str|Path): Path to config file
+            args (tuple): Positional arguments to the loader
+            kwargs (dict): Keyword arguments to the loader
+
+        Returns:
+            config: The parsed config
+
+        """
+        try:
+            key = self.key(config_class, path, args, kwargs)
+        except (OSError, TypeError, tomli.TOMLDecodeError):
+            # Leave anything we cannot key on to the original loader
+            self.misses += 1
+            return loader.__get__(None, config_class)(path, *args, **kwargs)
+
+        if key in self._store:
+            self.hits += 1
+            return self._store[key]
+
+        self.misses += 1
+        config = loader.__get__(None, config_class)(path, *args, **kwargs)
+        self._store[key] = config
+        return config
+
+    def clear(self):
+        """Clear the cache and the counters."""
+        self._store.clear()
+        self._includes.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Install the cache over the loader.
+
+        Yields:
+            self (ConfigCache): The active cache
+
+        """
+        owned = self.name in self.owner.__dict__
+        loader = inspect.getattr_static(self.owner, self.name)
+
+        def cached(cls, path, *args, **kwargs):
+            return self.load(loader, cls, path, *args, **kwargs)
+
+        setattr(self.owner, self.name, classmethod(cached))
+        try:
+            yield self
+        finally:
+            if owned:
+                setattr(self.owner, self.name, loader)
+            else:
+                delattr(self.owner, self.name)
+
+    def report(self):
+        """Return the cache statistics.
+
+        Returns:
+            stats (dict): Number of hits, misses and cached entries
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._store)}
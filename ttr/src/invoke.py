@@ -0,0 +1,355 @@
+"""Guarded invocation of tactus commands."""
+import builtins
+import contextlib
+import json
+import os
+import signal
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from deode.logs import logger
+
+# Number of samples needed before flagging stragglers
+MIN_SAMPLES = 3
+# Number of durations kept per key in the history file
+HISTORY_LENGTH = 20
+# Exceptions retried by default
+RETRY_ON = ["OSError", "TimeoutError"]
+# Exit code of a forked call failing with a retryable exception
+TRANSIENT_EXIT = 75
+# Seconds between checks of a forked call
+POLL_INTERVAL = 0.1
+# Seconds to wait for a forked call to stop after each signal
+KILL_WAIT = 5
+
+
+class TransientError(RuntimeError):
+    """A forked call failed with a retryable exception."""
+
+
+class Invoker:
+    """Run tactus commands with timeouts, retries and straggler detection.
+
+    Without a timeout the command is called in process. With a timeout
+    it is run in a forked process in its own session, and the whole
+    process group, including e.g. MPI launchers started by the task, is
+    killed when the time is up. Note that configs parsed in a forked call
+    are not added to the ConfigCache of the parent process. Attempts
+    failing with one of the exceptions in retry_on, by default OSError
+    and TimeoutError, are retried with an exponential backoff, other
+    failures are not retried. An invocation taking longer than
+    straggler_factor times the median duration, from the history file or
+    from this run, is flagged as a straggler.
+    """
+
+    def __init__(self, settings=None):
+        """Construct the object.
+
+        Arguments:
+            settings (dict, optional): Invocation settings
+
+        """
+        settings = {} if settings is None else settings
+        self.timeouts = settings.get("timeout", {})
+        self.retries = settings.get("retries", 0)
+        self.backoff = settings.get("backoff", 10)
+        self.straggler_factor = settings.get("straggler_factor", 2.0)
+        self.retry_on = tuple(
+            self.exception(name) for name in settings.get("retry_on", RETRY_ON)
+        )
+        self.history_file = settings.get("history")
+        self.history = {}
+        if self.history_file is not None and Path(self.history_file).is_file():
+            with open(self.history_file) as f:
+                self.history = json.load(f)
+        self.attempts = []
+        self.stragglers = []
+        self.failed = []
+
+    @staticmethod
+    def exception(name):
+        """Get a builtin exception class by name.
+
+        Arguments:
+            name (str): Name of the exception
+
+        Returns:
+            exception (class): The exception class
+
+        Raises:
+            ValueError: If the name is not a builtin exception
+
+        """
+        exception = getattr(builtins, name, None)
+        if not isinstance(exception, type) or not issubclass(exception, BaseException):
+            raise ValueError(f"Unknown exception {name} in retry_on")
+        return exception
+
+    def retryable(self, err):
+        """Check if a failure should be retried.
+
+        Arguments:
+            err (BaseException): The failure
+
+        Returns:
+            retryable (bool): True if the failure is transient
+        """
+        return isinstance(err, (TransientError, *self.retry_on))
+
+    def timeout(self, phase, task=None):
+        """Get the timeout for an invocation.
+
+        Arguments:
+            phase (str): Phase, e.g. configure or start
+            task (str, optional): Task name
+
+        Returns:
+            timeout (float): Timeout in seconds or None
+        """
+        tasks = self.timeouts.get("tasks", {})
+        if task is not None and task in tasks:
+            return tasks[task]
+        return self.timeouts.get(phase)
+
+    def median(self, key, phase, task=None):
+        """Get the expected duration of an invocation.
+
+        Arguments:
+            key (str): History key of the invocation
+            phase (str): Phase, e.g. configure or start
+            task (str, optional): Task name
+
+        Returns:
+            median (float): Median duration or None if not known
+        """
+        durations = self.history.get(key, [])
+        if len(durations) < MIN_SAMPLES:
+            durations = [
+                x["duration"]
+                for x in self.attempts
+                if x["phase"] == phase and x["task"] == task and x["status"] == "ok"
+            ]
+        if len(durations) < MIN_SAMPLES:
+            return None
+        return statistics.median(durations)
+
+    def child(self, func, cmd):
+        """Run the function in a forked process and exit.
+
+        Arguments:
+            func (callable): Function to call with cmd
+            cmd (list): Command
+
+        """
+        code = 1
+        try:
+            os.setsid()
+            func(cmd)
+            code = 0
+        except SystemExit as err:
+            code = err.code if isinstance(err.code, int) else int(err.code is not None)
+        except BaseException as err:  # noqa BLE001
+            logger.error("{}", err)
+            code = TRANSIENT_EXIT if self.retryable(err) else 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    @staticmethod
+    def send_signal(pid, sig, running=True):
+        """Send a signal to the process group of a forked call.
+
+        Arguments:
+            pid (int): Process id, also the process group id
+            sig (int): Signal
+            running (bool, optional): The process itself is not yet reaped
+
+        """
+        try:
+            os.killpg(pid, sig)
+        except ProcessLookupError:
+            # The child may not have started its own session yet
+            if running:
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(pid, sig)
+
+    @staticmethod
+    def reap(pid, timeout):
+        """Wait a bounded time for a forked call to exit.
+
+        Arguments:
+            pid (int): Process id
+            timeout (float): Seconds to wait
+
+        Returns:
+            status (int): Wait status or None if still running
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done != 0:
+                return status
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(POLL_INTERVAL, timeout))
+
+    def kill(self, pid, label):
+        """Kill the process group of a forked call.
+
+        A process stuck in uninterruptible I/O may not die even from
+        SIGKILL, it is then left behind rather than stalling the batch.
+
+        Arguments:
+            pid (int): Process id
+            label (str): Label used in log messages
+
+        """
+        self.send_signal(pid, signal.SIGTERM)
+        status = self.reap(pid, KILL_WAIT)
+        # Kill any processes left in the group, e.g. MPI launchers
+        self.send_signal(pid, signal.SIGKILL, running=status is None)
+        if status is None and self.reap(pid, KILL_WAIT) is None:
+            logger.error("Could not stop {} (pid {}), leaving it behind", label, pid)
+
+    def call(self, func, cmd, timeout, threshold, label):
+        """Call the function once.
+
+        Arguments:
+            func (callable): Function to call with cmd
+            cmd (list): Command
+            timeout (float): Timeout in seconds or None
+            threshold (float): Straggler threshold in seconds or None
+            label (str): Label used in log messages
+
+        Raises:
+            TimeoutError: If the timeout is exceeded
+            TransientError: If the forked call fails with a retryable exception
+            RuntimeError: If the forked call fails
+            SystemExit: If the call exits with a non zero code
+
+        """
+        if timeout is None:
+            try:
+                func(cmd)
+            except SystemExit as err:
+                if err.code not in (None, 0):
+                    raise
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            self.child(func, cmd)
+
+        start = time.monotonic()
+        warned = False
+        try:
+            while True:
+                status = self.reap(pid, POLL_INTERVAL)
+                if status is not None:
+                    break
+                elapsed = time.monotonic() - start
+                if threshold is not None and not warned and elapsed > threshold:
+                    logger.warning("{} is still running after {:.0f}s", label, threshold)
+                    warned = True
+                if elapsed > timeout:
+                    break
+        except BaseException:
+            # E.g. Ctrl-C, do not leave the forked call running
+            self.kill(pid, label)
+            raise
+
+        if status is None:
+            self.kill(pid, label)
+            raise TimeoutError(f"{label} timed out after {timeout}s")
+
+        code = os.waitstatus_to_exitcode(status)
+        if code == TRANSIENT_EXIT:
+            raise TransientError(f"{label} failed with a transient error")
+        if code != 0:
+            raise RuntimeError(f"{label} failed with exit code {code}")
+
+    def run(self, func, cmd, phase, name, task=None):
+        """Run a command with timeout, retries and straggler detection.
+
+        Arguments:
+            func (callable): Function to call with cmd
+            cmd (list): Command
+            phase (str): Phase, e.g. configure or start
+            name (str): Name of the case
+            task (str, optional): Task name
+
+        Returns:
+            success (bool): True if any attempt succeeded
+        """
+        key = ":".join(x for x in [phase, name, task] if x is not None)
+        timeout = self.timeout(phase, task)
+        median = self.median(key, phase, task)
+        threshold = None if median is None else self.straggler_factor * median
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                delay = self.backoff * 2 ** (attempt - 1)
+                logger.info("Retry {} in {}s, attempt {}", key, delay, attempt + 1)
+                time.sleep(delay)
+
+            start = time.monotonic()
+            status = "ok"
+            retry = False
+            try:
+                self.call(func, cmd, timeout, threshold, key)
+            except (Exception, SystemExit) as err:  # noqa BLE001
+                status = "timeout" if isinstance(err, TimeoutError) else "failed"
+                retry = self.retryable(err)
+                logger.error("{} {}: {!r}", key, status, err)
+            duration = time.monotonic() - start
+
+            self.attempts.append(
+                {
+                    "phase": phase,
+                    "name": name,
+                    "task": task,
+                    "attempt": attempt + 1,
+                    "duration": duration,
+                    "status": status,
+                }
+            )
+            if status == "ok":
+                if threshold is not None and duration > threshold:
+                    logger.warning(
+                        "{} is a straggler, {:.0f}s vs median {:.0f}s",
+                        key,
+                        duration,
+                        median,
+                    )
+                    self.stragglers.append(key)
+                self.history.setdefault(key, []).append(duration)
+                self.history[key] = self.history[key][-HISTORY_LENGTH:]
+                return True
+            if not retry:
+                break
+
+        self.failed.append(key)
+        return False
+
+    def save_history(self):
+        """Save the durations to the history file."""
+        if self.history_file is None:
+            return
+        with open(self.history_file, "w") as f:
+            json.dump(self.history, f, indent=2)
+
+    def report(self):
+        """Return the invocation statistics.
+
+        Returns:
+            stats (dict): Number of invocations, retries, failures and stragglers
+        """
+        return {
+            "invocations": sum(x["attempt"] == 1 for x in self.attempts),
+            "retries": sum(x["attempt"] > 1 for x in self.attempts),
+            "failed": list(self.failed),
+            "stragglers": list(self.stragglers),
+        }
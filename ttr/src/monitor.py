@@ -0,0 +1,341 @@
+"""Progress monitor for launched cases."""
+import asyncio
+import time
+from pathlib import Path
+
+from deode.logs import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETE = "complete"
+ABORTED = "aborted"
+STATES = (QUEUED, RUNNING, COMPLETE, ABORTED)
+FINISHED = (COMPLETE, ABORTED)
+
+
+class StatusBackend:
+    """Base class for status backends.
+
+    A backend reports the state of a batch of runs in one call so that a
+    poll costs one round trip regardless of the number of runs.
+    """
+
+    def poll(self, names):
+        """Get the state of a batch of runs.
+
+        Arguments:
+            names (list): Names of the runs to check
+
+        Raises:
+            NotImplementedError: Must be implemented by the backend
+
+        """
+        raise NotImplementedError
+
+    def times(self, names):  # noqa ARG002
+        """Get the start and end times of a batch of runs.
+
+        Arguments:
+            names (list): Names of the runs to check
+
+        Returns:
+            times (dict): Start and end time, as seconds since the epoch, per
+                          run for the runs the backend has times for
+        """
+        return {}
+
+
+class FileStatusBackend(StatusBackend):
+    """Status backend reading status files.
+
+    The state of run ``name`` is read from ``<directory>/<name>.status``,
+    holding the state optionally followed by the start and end times in
+    seconds since the epoch. The files are written by ttr itself in task
+    mode, see write_status, but may also be written by any external hook.
+    A missing file means the run is still queued.
+    """
+
+    def __init__(self, directory):
+        """Construct the object.
+
+        Arguments:
+            directory (str): Directory with status files
+
+        """
+        self.directory = Path(directory)
+
+    def read(self, name):
+        """Read the status file of a run.
+
+        Arguments:
+            name (str): Name of the run
+
+        Returns:
+            state (str): State of the run
+            start (float): Start time or None
+            end (float): End time or None
+        """
+        try:
+            fields = (self.directory / f"{name}.status").read_text().split()
+        except FileNotFoundError:
+            fields = []
+        state = fields[0] if len(fields) > 0 and fields[0] in STATES else QUEUED
+        try:
+            times = [float(x) for x in fields[1:3]]
+        except ValueError:
+            times = []
+        times += [None] * (2 - len(times))
+        return state, times[0], times[1]
+
+    def poll(self, names):
+        """Get the state of a batch of runs.
+
+        Arguments:
+            names (list): Names of the runs to check
+
+        Returns:
+            states (dict): State per run
+
+        """
+        return {name: self.read(name)[0] for name in names}
+
+    def times(self, names):
+        """Get the start and end times of a batch of runs.
+
+        Arguments:
+            names (list): Names of the runs to check
+
+        Returns:
+            times (dict): Start and end time per run
+        """
+        times = {}
+        for name in names:
+            _, start, end = self.read(name)
+            if start is not None:
+                times[name] = (start, end)
+        return times
+
+
+class EcflowStatusBackend(StatusBackend):
+    """Status backend querying an ecflow server.
+
+    The suite states are fetched with a single sync of the server
+    definitions per poll.
+    """
+
+    ECFLOW_STATES = {
+        "unknown": QUEUED,
+        "queued": QUEUED,
+        "submitted": RUNNING,
+        "active": RUNNING,
+        "complete": COMPLETE,
+        "aborted": ABORTED,
+    }
+
+    def __init__(self, host=None, port=None):
+        """Construct the object.
+
+        Arguments:
+            host (str, optional): ecflow host, defaults to ECF_HOST
+            port (str, optional): ecflow port, defaults to ECF_PORT
+
+        Raises:
+            ModuleNotFoundError: If ecflow is not available
+
+        """
+        try:
+            import ecflow  # noqa PLC0415
+        except ModuleNotFoundError as err:
+            raise ModuleNotFoundError(
+                "The ecflow status backend requires the ecflow python module"
+            ) from err
+
+        self.client = ecflow.Client()
+        if host is not None:
+            self.client.set_host_port(host, str(port))
+
+    def poll(self, names):
+        """Get the state of a batch of runs.
+
+        Arguments:
+            names (list): Names of the suites to check
+
+        Returns:
+            states (dict): State per suite
+
+        """
+        self.client.sync_local()
+        defs = self.client.get_defs()
+        states = {}
+        for name in names:
+            suite = None if defs is None else defs.find_suite(name)
+            state = QUEUED if suite is None else str(suite.get_state())
+            states[name] = self.ECFLOW_STATES.get(state, QUEUED)
+        return states
+
+
+BACKENDS = {
+    "file": FileStatusBackend,
+    "ecflow": EcflowStatusBackend,
+}
+
+
+def get_backend(name, **kwargs):
+    """Create a status backend.
+
+    Arguments:
+        name (str): Name of the backend
+        kwargs (dict): Arguments to the backend
+
+    Returns:
+        backend (StatusBackend): The backend
+
+    Raises:
+        ValueError: If the backend is unknown
+
+    """
+    try:
+        return BACKENDS[name](**kwargs)
+    except KeyError as err:
+        raise ValueError(
+            f"Unknown status backend {name}. Available are {list(BACKENDS)}"
+        ) from err
+
+
+def write_status(directory, name, state, start=None, end=None):
+    """Write the state of a run for the file backend.
+
+    Arguments:
+        directory (str): Directory with status files
+        name (str): Name of the run
+        state (str): State of the run
+        start (float, optional): Start time in seconds since the epoch
+        end (float, optional): End time in seconds since the epoch
+
+    """
+    fields = [state] + [f"{x:.3f}" for x in [start, end] if x is not None]
+    Path(directory, f"{name}.status").write_text(" ".join(fields) + "\n")
+
+
+class RunMonitor:
+    """Track the state of all runs in a batch."""
+
+    def __init__(self, runs, backend, interval=30, timeout=None):
+        """Construct the object.
+
+        Arguments:
+            runs (dict): Names of the runs per case
+            backend (StatusBackend): Backend used for polling
+            interval (float, optional): Seconds between polls
+            timeout (float, optional): Give up after this many seconds
+
+        """
+        self.runs = runs
+        self.backend = backend
+        self.interval = interval
+        self.timeout = timeout
+        names = [name for names in runs.values() for name in names]
+        self.states = dict.fromkeys(names, QUEUED)
+        self.started = {}
+        self.finished = {}
+
+    def pending(self):
+        """Get the runs not yet finished.
+
+        Returns:
+            names (list): Runs not yet finished
+        """
+        return [name for name, state in self.states.items() if state not in FINISHED]
+
+    def update(self, states):
+        """Update the states and timings.
+
+        Arguments:
+            states (dict): New state per run
+
+        """
+        now = time.monotonic()
+        for name, state in states.items():
+            if state != self.states[name]:
+                logger.info(" {}: {} -> {}", name, self.states[name], state)
+            if state != QUEUED:
+                self.started.setdefault(name, now)
+            if state in FINISHED:
+                self.finished.setdefault(name, now)
+            self.states[name] = state
+
+    def counts(self):
+        """Count the runs per state.
+
+        Returns:
+            counts (dict): Number of runs per state
+        """
+        counts = dict.fromkeys(STATES, 0)
+        for state in self.states.values():
+            counts[state] += 1
+        return counts
+
+    async def watch(self):
+        """Poll the backend until all runs are finished.
+
+        Returns:
+            summary (dict): Summary of the runs
+        """
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        while True:
+            pending = self.pending()
+            if len(pending) > 0:
+                states = await loop.run_in_executor(None, self.backend.poll, pending)
+                self.update(states)
+            counts = self.counts()
+            logger.info("Status: {}", ", ".join(f"{k}={v}" for k, v in counts.items()))
+            if len(self.pending()) == 0:
+                break
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                logger.warning("Stop watching after {}s", self.timeout)
+                break
+            await asyncio.sleep(self.interval)
+
+        return self.summary()
+
+    def run(self):
+        """Run the monitor.
+
+        Returns:
+            summary (dict): Summary of the runs
+        """
+        return asyncio.run(self.watch())
+
+    def summary(self):
+        """Summarize and log the state of all runs.
+
+        Returns:
+            summary (dict): State and duration per run
+        """
+        # Prefer the times reported by the backend over the poll times
+        times = {
+            name: (self.started.get(name), self.finished.get(name))
+            for name in self.states
+        }
+        times.update(
+            (name, x)
+            for name, x in self.backend.times(list(self.states)).items()
+            if None not in x
+        )
+
+        summary = {}
+        logger.info("Summary:")
+        for case, names in self.runs.items():
+            for name in names:
+                start, end = times[name]
+                duration = None if start is None or end is None else end - start
+                summary[name] = {"case": case, "state": self.states[name]}
+                summary[name]["duration"] = duration
+                logger.info(
+                    "    {:<50} {:<9} {}",
+                    name,
+                    self.states[name],
+                    "-" if duration is None else f"{duration:.0f}s",
+                )
+        return summary
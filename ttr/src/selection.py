@@ -0,0 +1,168 @@
+r"""Selection of cases from a query expression.
+
+An expression is a comma separated list of alternatives whose results
+are joined. Each alternative is a white space separated list of terms
+that all have to match:
+
+    name_glob      Case name matching a glob, e.g. cy49t2_*_target
+    attr=glob      Attribute matching a glob, e.g. compiler=gnu
+    !term          Negation of a term
+    +hosts         Add the host cases of the selection, recursively
+
+The available attributes are listed in ATTRIBUTES. Empty alternatives
+are ignored, and an expression without any terms is rejected. Use ``*``
+to select all cases.
+
+Example:
+    ttr -c config_files/ial_pr_atos_bologna.toml -l \\
+        --select "base=cy49t2_* compiler=gnu precision=R32 +hosts"
+"""
+import fnmatch
+
+ATTRIBUTES = ("name", "base", "host", "subtag", "compiler", "precision")
+HOSTS = "+hosts"
+
+
+class CaseIndex:
+    """Index of case attributes for fast selection."""
+
+    def __init__(self, cases, selection=None):
+        """Construct the index.
+
+        Arguments:
+            cases (dict): Case definitions
+            selection (list, optional): Cases to select from, defaults to all.
+                                        Hosts are added from all cases.
+
+        """
+        if selection is None:
+            selection = cases
+        self.names = [name for name in selection if name in cases]
+        self.order = {name: i for i, name in enumerate(cases)}
+        self.hosts = {
+            name: item["host"] for name, item in cases.items() if "host" in item
+        }
+        self.index = {attr: {} for attr in ATTRIBUTES}
+        for name in self.names:
+            for attr, value in self.attributes(name, cases[name]).items():
+                self.index[attr].setdefault(value, set()).add(name)
+
+    @staticmethod
+    def attributes(name, item):
+        """Get the selectable attributes of a case.
+
+        Arguments:
+            name (str): Name of the case
+            item (dict): Case definition
+
+        Returns:
+            attrs (dict): Attribute values
+        """
+        subtag = item.get("subtag", "")
+        return {
+            "name": name,
+            "base": item.get("base", name),
+            "host": item.get("host", ""),
+            "subtag": subtag,
+            "compiler": item.get("compiler", subtag.strip("_")),
+            "precision": item.get("precision", ""),
+        }
+
+    def match(self, attr, pattern):
+        """Find the cases with an attribute matching a glob.
+
+        Arguments:
+            attr (str): Attribute name
+            pattern (str): Glob pattern
+
+        Returns:
+            names (set): Matching cases
+
+        Raises:
+            ValueError: If the attribute is unknown
+
+        """
+        if attr not in self.index:
+            raise ValueError(
+                f"Unknown selection attribute {attr}. Available are {list(ATTRIBUTES)}"
+            )
+        values = self.index[attr]
+        if pattern in values:
+            return set(values[pattern])
+        names = set()
+        for value in fnmatch.filter(values, pattern):
+            names |= values[value]
+        return names
+
+    def term(self, term):
+        """Evaluate a single term.
+
+        Arguments:
+            term (str): Term to evaluate
+
+        Returns:
+            names (set): Matching cases
+        """
+        if term.startswith("!"):
+            return set(self.names) - self.term(term[1:])
+        attr, sep, pattern = term.partition("=")
+        if sep == "":
+            attr, pattern = "name", term
+        return self.match(attr, pattern)
+
+    def with_hosts(self, names):
+        """Add the host cases to a selection.
+
+        Arguments:
+            names (set): Selected cases
+
+        Returns:
+            names (set): Selected cases including their hosts
+        """
+        names = set(names)
+        todo = list(names)
+        while len(todo) > 0:
+            host = self.hosts.get(todo.pop())
+            if host is not None and host in self.order and host not in names:
+                names.add(host)
+                todo.append(host)
+        return names
+
+    def select(self, expression):
+        """Select cases from an expression.
+
+        Arguments:
+            expression (str): Selection expression
+
+        Returns:
+            selection (list): Selected cases in definition order
+
+        Raises:
+            ValueError: If the expression has no terms
+
+        """
+        selected = set()
+        hosts = False
+        found = False
+        for alternative in expression.split(","):
+            terms = alternative.split()
+            if HOSTS in terms:
+                hosts = True
+                terms = [term for term in terms if term != HOSTS]
+            if len(terms) == 0:
+                continue
+            found = True
+            names = set(self.names)
+            for term in terms:
+                names &= self.term(term)
+            selected |= names
+
+        if not found:
+            raise ValueError(
+                f"The selection '{expression}' has no terms, use '*' to select all cases"
+            )
+
+        if hosts:
+            selected = self.with_hosts(selected)
+
+        return sorted(selected, key=self.order.get)
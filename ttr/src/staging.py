@@ -0,0 +1,246 @@
+"""Staging of test data into a local cache."""
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from deode.logs import logger
+
+MANIFEST = "MANIFEST.sha256"
+STAMP = ".ttr_manifest"
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path, algorithm="sha256", chunk_size=CHUNK_SIZE):
+    """Compute the checksum of a file without reading it all into memory.
+
+    Arguments:
+        path (str|Path): File to hash
+        algorithm (str, optional): Hash algorithm
+        chunk_size (int, optional): Bytes read per chunk
+
+    Returns:
+        checksum (str): Hex digest of the file
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(path):
+    """Read a checksum manifest in sha256sum format.
+
+    Arguments:
+        path (str|Path): Manifest file
+
+    Returns:
+        manifest (dict): Checksum per relative path
+
+    Raises:
+        ValueError: If a line cannot be parsed
+
+    """
+    manifest = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip() == "" or line.startswith("#"):
+                continue
+            try:
+                checksum, name = line.rstrip("\n").split(maxsplit=1)
+            except ValueError as err:
+                raise ValueError(f"Invalid line in {path}: {line}") from err
+            manifest[name.lstrip("*")] = checksum
+    return manifest
+
+
+class DataStager:
+    """Stage test data sets into a cache directory.
+
+    Each data set is a directory ``<source>/<name>`` that is copied, or
+    hard linked, to ``<cache>/<name>``. If the data set has a checksum
+    manifest all staged files are verified against it. A verified data
+    set is reused by later runs as long as the manifest is unchanged and
+    the size and modification time of each cached file are the same as
+    when it was verified.
+    """
+
+    def __init__(self, source, cache, workers=8, link=False, manifest=MANIFEST):
+        """Construct the object.
+
+        Arguments:
+            source (str): Directory holding the data sets
+            cache (str): Cache directory
+            workers (int, optional): Number of parallel copies
+            link (bool, optional): Hard link instead of copy if possible
+            manifest (str, optional): Name of the manifest in each data set
+
+        """
+        self.source = Path(source)
+        self.cache = Path(cache)
+        self.workers = workers
+        self.link = link
+        self.manifest = manifest
+
+    def files(self, name):
+        """List the files of a data set.
+
+        Arguments:
+            name (str): Name of the data set
+
+        Returns:
+            files (dict): Checksum, or None if unknown, per relative path
+
+        Raises:
+            FileNotFoundError: If the data set or any listed file is missing
+            ValueError: If the manifest lists paths outside the data set
+
+        """
+        source = self.source / name
+        if not source.is_dir():
+            raise FileNotFoundError(f"Test data {source} not found")
+
+        manifest = source / self.manifest
+        if manifest.is_file():
+            files = read_manifest(manifest)
+            invalid = [x for x in files if Path(x).is_absolute() or ".." in Path(x).parts]
+            if len(invalid) > 0:
+                raise ValueError(f"Paths outside the data set in {manifest}: {invalid}")
+            missing = [x for x in files if not (source / x).is_file()]
+            if len(missing) > 0:
+                raise FileNotFoundError(f"Missing test data in {source}: {missing}")
+            return files
+
+        logger.warning("No manifest found in {}, staged data is not verified", source)
+        return {
+            str(x.relative_to(source)): None for x in source.rglob("*") if x.is_file()
+        }
+
+    def stamp(self, name, files):
+        """Record a verified data set.
+
+        Arguments:
+            name (str): Name of the data set
+            files (dict): Checksum per relative path
+
+        """
+        cached = {}
+        for path in files:
+            stat = (self.cache / name / path).stat()
+            cached[path] = [stat.st_size, stat.st_mtime_ns]
+        manifest = (self.source / name / self.manifest).read_text()
+        with open(self.cache / name / STAMP, "w") as f:
+            json.dump({"manifest": manifest, "files": cached}, f)
+
+    def is_cached(self, name, files):
+        """Check if a verified copy of a data set is available.
+
+        Arguments:
+            name (str): Name of the data set
+            files (dict): Checksum per relative path
+
+        Returns:
+            cached (bool): True if the cached copy can be reused
+        """
+        stamp = self.cache / name / STAMP
+        manifest = self.source / name / self.manifest
+        if not stamp.is_file() or not manifest.is_file():
+            return False
+        try:
+            with open(stamp) as f:
+                verified = json.load(f)
+        except ValueError:
+            return False
+        if verified.get("manifest") != manifest.read_text():
+            return False
+        for path in files:
+            cached = self.cache / name / path
+            if not cached.is_file() or path not in verified["files"]:
+                return False
+            stat = cached.stat()
+            if [stat.st_size, stat.st_mtime_ns] != verified["files"][path]:
+                return False
+        return True
+
+    def stage_file(self, name, path, checksum):
+        """Stage and verify a single file.
+
+        Arguments:
+            name (str): Name of the data set
+            path (str): Path relative to the data set
+            checksum (str): Expected checksum or None
+
+        Raises:
+            ValueError: If the checksum does not match
+
+        """
+        src = self.source / name / path
+        dst = self.cache / name / path
+
+        if dst.is_file():
+            if checksum is None:
+                stat, dst_stat = src.stat(), dst.stat()
+                if (stat.st_size, int(stat.st_mtime)) == (
+                    dst_stat.st_size,
+                    int(dst_stat.st_mtime),
+                ):
+                    return
+            elif file_hash(dst) == checksum:
+                return
+            dst.unlink()
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        linked = False
+        if self.link:
+            try:
+                os.link(src, dst)
+                linked = True
+            except OSError:
+                linked = False
+        if not linked:
+            shutil.copy2(src, dst)
+
+        if checksum is not None and file_hash(dst) != checksum:
+            dst.unlink()
+            raise ValueError(f"Checksum mismatch for {src}")
+
+    def stage(self, names):
+        """Stage a number of data sets in parallel.
+
+        Arguments:
+            names (list): Names of the data sets
+
+        Returns:
+            paths (dict): Cached path per data set
+        """
+        # Check all data sets before copying anything
+        files = {name: self.files(name) for name in names}
+
+        jobs = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for name, checksums in files.items():
+                if self.is_cached(name, checksums):
+                    logger.info(" reuse cached test data {}", self.cache / name)
+                    continue
+                logger.info(" stage {} to {}", self.source / name, self.cache / name)
+                jobs.extend(
+                    pool.submit(self.stage_file, name, path, checksum)
+                    for path, checksum in checksums.items()
+                )
+
+            for job in concurrent.futures.as_completed(jobs):
+                exc = job.exception()
+                if exc is not None:
+                    for pending in jobs:
+                        pending.cancel()
+                    raise exc
+
+        for name, checksums in files.items():
+            if (self.source / name / self.manifest).is_file():
+                (self.cache / name).mkdir(parents=True, exist_ok=True)
+                self.stamp(name, checksums)
+
+        return {name: self.cache / name for name in names}
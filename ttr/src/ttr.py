@@ -3,8 +3,10 @@ import argparse
 import contextlib
 import copy
 import glob
+import json
 import os
 import sys
+import time
 from pathlib import Path
 
 import tomli
@@ -14,6 +16,56 @@ from deode.fullpos import flatten_list
 from deode.general_utils import merge_dicts
 from deode.logs import logger
 
+from ttr.src.config_cache import ConfigCache
+from ttr.src.invoke import Invoker
+from ttr.src.monitor import (
+    ABORTED,
+    COMPLETE,
+    FINISHED,
+    QUEUED,
+    RUNNING,
+    RunMonitor,
+    get_backend,
+    write_status,
+)
+from ttr.src.selection import CaseIndex
+from ttr.src.staging import MANIFEST, DataStager
+
+# File recording the runs launched by start
+RUN_FILE = "ttr_runs.json"
+
+# Macro for the test data location in task mode cases
+TEST_DATA_MACRO = "@TEST_DATA_PATH@"
+
+# Placeholders for the macros that differ between cases
+CASE_MACROS = {
+    "counter": "{ttr:counter}",
+    "host_case": "{ttr:host_case}",
+    "host_domain": "{ttr:host_domain}",
+    "subtag": "{ttr:subtag}",
+}
+
+
+def replace_macros(data, macros):
+    """Replace placeholders in all strings of a nested structure.
+
+    Arguments:
+        data (dict|list|str): Data to process
+        macros (dict): Placeholders and their values
+
+    Returns:
+        data (dict|list|str): Copy of data with placeholders replaced
+    """
+    if isinstance(data, dict):
+        return {k: replace_macros(v, macros) for k, v in data.items()}
+    if isinstance(data, list):
+        return [replace_macros(v, macros) for v in data]
+    if isinstance(data, str):
+        for placeholder, value in macros.items():
+            if placeholder in data:
+                data = data.replace(placeholder, str(value))
+    return data
+
 
 class TestCases:
     """Class to orchestrate the tests."""
@@ -24,11 +76,16 @@ class TestCases:
         Args:
             args (argsparse objectl): Command line arguments
 
+        Raises:
+            ValueError: If the selection matches no cases
+
         """
         ConfigPaths.CONFIG_DATA_SEARCHPATHS.insert(
             0, os.path.join(os.getcwd(), "config_files")
         )
 
+        self.config_cache = ConfigCache(ParsedConfig)
+
         definitions = {"general": {}, "modifs": {}}
         if args.config_file is not None:
             self.config = ParsedConfig.from_file(args.config_file, json_schema={})
@@ -42,6 +99,10 @@ class TestCases:
         self.cmds = {}
         self.mode = definitions["general"].get("mode", "suite")
         self.extra = definitions["general"].get("extra", [])
+        self.watch_settings = definitions["general"].get("watch", {})
+        self.staging = definitions["general"].get("staging", {})
+        self.invoker = Invoker(definitions["general"].get("invoke", {}))
+        self.failed = set()
         self.get_tag(definitions)
         self.dry = args.dry if args.dry else definitions["general"].get("dry", False)
         self.modifs = definitions["modifs"]
@@ -54,6 +115,16 @@ class TestCases:
                 if definitions["ial"].get("active", False):
                     self.expand_tests(definitions)
 
+        select = args.select
+        if select is None:
+            select = definitions["general"].get("select")
+        if select is not None:
+            # Select within the resolved selection, hosts from all cases
+            self.selection = CaseIndex(self.cases, self.selection).select(select)
+            if len(self.selection) == 0:
+                raise ValueError(f"The selection '{select}' matched no cases")
+            logger.info(" select: {}", select)
+
         logger.info("Using config file: {}", args.config_file)
         logger.info(" tag: {}", self.tag)
 
@@ -168,6 +239,8 @@ class TestCases:
                     self.selection.append(tag)
                     self.cases[tag] = {
                         "base": conf,
+                        "compiler": compiler,
+                        "precision": precision,
                         "modifs": {
                             "scheduler": {"ecfvars": {"case_prefix": f"{prefix}{tag}_"}},
                             "submission": {
@@ -204,6 +277,58 @@ class TestCases:
 
         return host_cases
 
+    def stage_data(self):
+        """Stage the test data of the selected task mode cases.
+
+        The data sets referred to by any system setting of the form
+        @TEST_DATA_PATH@/<name>[/<path>], e.g. case_data, climdir or
+        intp_bddir, are copied to the cache and verified before anything
+        is launched. These settings are then pointed to the cached copy.
+
+        Raises:
+            ValueError: If no source for the test data is given
+
+        """
+        if self.mode != "task" or not self.staging.get("active", False):
+            return
+
+        datasets = {}
+        prefix = f"{TEST_DATA_MACRO}/"
+        for case in self.selection:
+            system = self.cases[case].get("modifs", {}).get("system", {})
+            for key, value in system.items():
+                if isinstance(value, str) and value.startswith(prefix):
+                    name, _, path = value[len(prefix) :].partition("/")
+                    datasets[(case, key)] = (name, path)
+
+        if len(datasets) == 0:
+            return
+
+        if "source" not in self.staging:
+            raise ValueError("The test data source general.staging.source is not set")
+
+        def expand(path):
+            path = os.path.expandvars(os.path.expanduser(path))
+            return path.replace("@USER@", os.environ["USER"])
+
+        stager = DataStager(
+            expand(self.staging["source"]),
+            expand(self.staging.get("cache", f"{self.test_dir}/test_data")),
+            workers=self.staging.get("workers", 8),
+            link=self.staging.get("link", False),
+            manifest=self.staging.get("manifest", MANIFEST),
+        )
+        names = sorted({name for name, _ in datasets.values()})
+        logger.info("Stage test data {} to {}", names, stager.cache)
+        if self.dry:
+            return
+
+        paths = stager.stage(names)
+        for (case, key), (name, path) in datasets.items():
+            value = str((paths[name] / path).resolve())
+            logger.info(" use {} as {} for {}", value, key, case)
+            self.cases[case]["modifs"]["system"][key] = value
+
     def create(self, host_cases=None):
         """Create the tests.
 
@@ -221,42 +346,50 @@ class TestCases:
 
         logger.info("Create {}config files in {}", label, self.test_dir)
 
-        assigned = {}
-        for i, (case, item) in enumerate(self.cases.items()):
-            assigned[case] = i + 1
-
-            if case not in cases or "config_name" in self.cases[case]:
-                continue
-
+        assigned = {case: i + 1 for i, case in enumerate(self.cases)}
+        cases = set(cases)
+        selected = [
+            case
+            for case in self.cases
+            if case in cases
+            and "config_name" not in self.cases[case]
+            and case not in self.failed
+        ]
+
+        # Cases depending on a failed host cannot run
+        for case in [x for x in selected if self.cases[x].get("host") in self.failed]:
+            logger.error("Skip {} as its host {} failed", case, self.cases[case]["host"])
+            self.failed.add(case)
+            selected.remove(case)
+
+        if len(selected) == 0:
+            return
+
+        # Expand the global and all case modifications in one go
+        config, global_modifs, case_modifs = self.macro_template(selected)
+
+        for case in selected:
+            item = self.cases[case]
             counter = assigned[item["host"]] if "host" in item else assigned[case]
             base = item["base"] if "base" in item else case
-            subtag = item["subtag"] if "subtag" in item else ""
-            host_case = item["hostname"] if "hostname" in item else ""
-            host_domain = item["hostdomain"] if "hostdomain" in item else ""
-
             extra = list(self.extra) + (list(item["extra"]) if "extra" in item else [])
 
-            # Merge and replace macros
-            modifs = merge_dicts(self.modifs, self.cases[case].get("modifs", {}), True)
-            config = self.config.copy(
-                update={
-                    "modifs": modifs,
-                    "modif_macros": {
-                        "counter": counter,
-                        "host_case": host_case,
-                        "host_domain": host_domain,
-                        "tag": self.tag,
-                        "subtag": subtag,
-                    },
-                }
+            # Merge and replace the per case macros
+            modifs = merge_dicts(global_modifs, case_modifs.get(case, {}), True)
+            modifs = replace_macros(
+                modifs,
+                {
+                    CASE_MACROS["counter"]: counter,
+                    CASE_MACROS["host_case"]: item.get("hostname", ""),
+                    CASE_MACROS["host_domain"]: item.get("hostdomain", ""),
+                    CASE_MACROS["subtag"]: item.get("subtag", ""),
+                },
             )
-            with contextlib.suppress(KeyError):
-                config = config.expand_macros(True)
 
             # Save the modifications
             outfile = f"{self.test_dir}/modifs_{case}.toml"
             logger.info(" create: {}", outfile)
-            config["modifs"].save_as(outfile)
+            config["modifs"].copy(update=modifs).save_as(outfile)
 
             # Build the command to execute
             cmd = [
@@ -269,6 +402,69 @@ class TestCases:
             ]
             self.cmds[case] = flatten_list(cmd)
 
+    def expand_config(self, update, label):
+        """Expand the macros of the config with some settings updated.
+
+        Arguments:
+            update (dict): Settings to update the config with
+            label (str): Label used in log messages
+
+        Returns:
+            config (ParsedConfig): Expanded config, or the updated config
+                                   if the macros could not be expanded
+        """
+        config = self.config.copy(update=update)
+        try:
+            return config.expand_macros(True)
+        except KeyError as err:
+            logger.warning("Could not expand macros for {}: {}", label, err)
+            return config
+
+    def macro_template(self, cases):
+        """Expand the macros for the global and the case modifications.
+
+        The per case macros are replaced by placeholders so that the
+        expansion over the full config is only done once for all cases.
+        The placeholders are replaced per case by replace_macros. If the
+        expansion fails, the cases are expanded one by one so that only
+        the failing cases are left unexpanded.
+
+        Arguments:
+            cases (list): Cases to expand the modifications for
+
+        Returns:
+            config (ParsedConfig): Expanded config
+            modifs (dict): Expanded global modifications
+            case_modifs (dict): Expanded modifications per case
+        """
+        update = {
+            "modifs": self.modifs,
+            "modif_macros": {**CASE_MACROS, "tag": self.tag},
+        }
+        case_modifs = {
+            case: self.cases[case]["modifs"]
+            for case in cases
+            if "modifs" in self.cases[case]
+        }
+        try:
+            config = self.config.copy(
+                update={**update, "case_modifs": case_modifs}
+            ).expand_macros(True)
+        except KeyError as err:
+            logger.warning("Expand macros case by case: {}", err)
+        else:
+            expanded = config.dict()
+            return config, expanded["modifs"], expanded.get("case_modifs", {})
+
+        config = self.expand_config(update, "the global modifications")
+        expanded = {}
+        for case, modifs in case_modifs.items():
+            case_config = self.expand_config(
+                {**update, "case_modifs": {case: modifs}}, case
+            )
+            expanded[case] = case_config.dict()["case_modifs"][case]
+        return config, config.dict()["modifs"], expanded
+
     def configure(self, config_hosts=False, cmds=None):
         """Configure tests.
 
@@ -284,7 +480,7 @@ class TestCases:
             cmds = []
         cases = {}
         for case, cmd in self.cmds.items():
-            if "config_name" in self.cases[case]:
+            if "config_name" in self.cases[case] or case in self.failed:
                 continue
 
             logger.info("Configure case {} with\n", case)
@@ -294,7 +490,10 @@ class TestCases:
             logger.info("Use cmd:\n\n{}\n\n", cmd_txt)
 
             # Call tactus main to create new config, and possibly start suite
-            tactus_main(cmd)
+            if not self.invoker.run(tactus_main, cmd, "configure", case):
+                logger.error("Skip case {}", case)
+                self.failed.add(case)
+                continue
 
             # Update the case settings
             directory = Path(self.test_dir)
@@ -366,11 +565,15 @@ class TestCases:
 
     def start(self):
         """Start the run."""
+        runs = {}
         for case in self.cmds:
+            if "config_name" not in self.cases[case]:
+                logger.error("Case {} is not configured, skip it", case)
+                continue
             config_name = self.cases[case]["config_name"]
             if self.mode == "task":
-                cmds = [
-                    [
+                runs[case] = {
+                    f"{task}.{config_name}": [
                         "run",
                         "--config-file",
                         f"{self.test_dir}/{config_name}.toml",
@@ -382,10 +585,10 @@ class TestCases:
                         f"{self.test_dir}/{task}.{config_name}.log",
                     ]
                     for task in self.cases[case]["tasks"]
-                ]
+                }
             else:
-                cmds = [
-                    [
+                runs[case] = {
+                    config_name: [
                         "start",
                         "suite",
                         "--config-file",
@@ -394,15 +597,139 @@ class TestCases:
                         f"{self.test_dir}/{config_name}.def",
                         "-k",
                     ]
-                ]
+                }
+
+        if not self.dry:
+            self.save_runs(runs)
+
+        launched = set()
+        try:
+            for case, cmds in runs.items():
+                names = list(cmds)
+                for i, (name, cmd) in enumerate(cmds.items()):
+                    cmd_txt = " ".join(cmd)
+                    logger.info("Use cmd:\n\n{}\n\n", cmd_txt)
+
+                    # Start suite or task with tactus
+                    launched.add(name)
+                    if self.dry or self.launch(case, name, cmd):
+                        continue
+
+                    # Later tasks depend on the failed one
+                    if self.mode == "task" and i + 1 < len(names):
+                        logger.error(
+                            "Skip remaining tasks {} of {}", names[i + 1 :], case
+                        )
+                    break
+        finally:
+            # Runs never launched will not finish, mark them for the monitor
+            if not self.dry and self.mode == "task":
+                for cmds in runs.values():
+                    for name in cmds:
+                        if name not in launched:
+                            write_status(self.test_dir, name, ABORTED)
+
+    def launch(self, case, name, cmd):
+        """Launch a suite or task with tactus.
+
+        In task mode the task runs to completion here and the state is
+        recorded for the file status backend.
+
+        Arguments:
+            case (str): Name of the case
+            name (str): Name of the run
+            cmd (list): Tactus command
+
+        Returns:
+            success (bool): True if the launch succeeded
+        """
+        if self.mode != "task":
+            return self.invoker.run(tactus_main, cmd, "start", case)
+
+        task = cmd[cmd.index("--task") + 1]
+        start = time.time()
+        write_status(self.test_dir, name, RUNNING, start)
+        success = False
+        try:
+            success = self.invoker.run(tactus_main, cmd, "start", case, task)
+        finally:
+            state = COMPLETE if success else ABORTED
+            write_status(self.test_dir, name, state, start, time.time())
+        return success
+
+    def save_runs(self, runs):
+        """Save the launched runs for later monitoring.
+
+        Arguments:
+            runs (dict): Tactus commands per run name and case
+
+        """
+        run_file = f"{self.test_dir}/{RUN_FILE}"
+        logger.info("Save runs to {}", run_file)
+        with open(run_file, "w") as f:
+            json.dump(
+                {
+                    "mode": self.mode,
+                    "runs": {case: list(cmds) for case, cmds in runs.items()},
+                },
+                f,
+                indent=2,
+            )
+        if self.mode == "task":
+            for cmds in runs.values():
+                for name in cmds:
+                    write_status(self.test_dir, name, QUEUED)
 
-            for cmd in cmds:
-                cmd_txt = " ".join(cmd)
-                logger.info("Use cmd:\n\n{}\n\n", cmd_txt)
+    def watch(self):
+        """Watch the runs of the last start until they have finished.
 
-                # Start suite or task with tactus
-                if not self.dry:
-                    tactus_main(cmd)
+        Returns:
+            success (bool): True if all runs finished and none aborted
+        """
+        run_file = f"{self.test_dir}/{RUN_FILE}"
+        with open(run_file) as f:
+            runs = json.load(f)["runs"]
+
+        settings = dict(self.watch_settings)
+        backend = settings.pop("backend", "file" if self.mode == "task" else "ecflow")
+        interval = settings.pop("interval", 30)
+        timeout = settings.pop("timeout", None)
+        if backend == "file":
+            settings.setdefault("directory", self.test_dir)
+
+        logger.info("Watch runs in {} using the {} backend", run_file, backend)
+        monitor = RunMonitor(
+            runs, get_backend(backend, **settings), interval=interval, timeout=timeout
+        )
+        summary = monitor.run()
+        unfinished = [k for k, x in summary.items() if x["state"] not in FINISHED]
+        if len(unfinished) > 0:
+            logger.error("Runs not finished: {}", unfinished)
+            return False
+        return all(x["state"] != ABORTED for x in summary.values())
+
+    def report(self):
+        """Report run statistics."""
+        stats = self.config_cache.report()
+        logger.info(
+            "Config cache: {} hits, {} misses, {} entries",
+            stats["hits"],
+            stats["misses"],
+            stats["entries"],
+        )
+
+        stats = self.invoker.report()
+        logger.info(
+            "Tactus calls: {} invocations, {} retries, {} stragglers",
+            stats["invocations"],
+            stats["retries"],
+            len(stats["stragglers"]),
+        )
+        for key in stats["stragglers"]:
+            logger.warning(" straggler: {}", key)
+        for key in stats["failed"]:
+            logger.error(" failed: {}", key)
+        self.invoker.save_history()
 
 
 def execute(t, args):
@@ -412,20 +739,31 @@ def execute(t, args):
         t (TestCases object): Object with test cases to execute
         args (ArgsPares object): Command line arguments
 
+    Returns:
+        success (bool): True if no case or tactus call failed
     """
-    # Check dependencies and create possible host cases
-    host_cases = t.prepare()
-    t.create(host_cases)
-    hostnames = t.configure(config_hosts=True)
-    t.update_hostnames(hostnames)
+    # Stage the test data before creating the modifications
+    if args.run:
+        t.stage_data()
 
-    # Create the modification files
-    t.create()
+    # Reuse parsed configurations across all tactus calls in this run
+    with t.config_cache.installed():
+        # Check dependencies and create possible host cases
+        host_cases = t.prepare()
+        t.create(host_cases)
+        hostnames = t.configure(config_hosts=True)
+        t.update_hostnames(hostnames)
 
-    # Run
-    if args.run:
-        t.configure()
-        t.start()
+        # Create the modification files
+        t.create()
+
+        # Run
+        if args.run:
+            t.configure()
+            t.start()
+
+    t.report()
+    return len(t.failed) == 0 and len(t.invoker.report()["failed"]) == 0
 
 
 def main(argv=None):
@@ -474,6 +812,23 @@ def main(argv=None):
         required=False,
     )
 
+    parser.add_argument(
+        "--select",
+        "-s",
+        dest="select",
+        default=None,
+        help="Select cases by expression, e.g. 'base=cy49t2_* compiler=gnu +hosts'",
+        required=False,
+    )
+    parser.add_argument(
+        "--watch",
+        "-w",
+        action="store_true",
+        default=False,
+        help="Watch the launched cases until they have finished",
+        required=False,
+    )
+
     parser.add_argument(
         "-m",
         action="store_false",
@@ -491,8 +846,11 @@ def main(argv=None):
         t.get_binaries()
     elif args.list:
         t.list()
-    elif args.config_file is not None:
-        execute(t, args)
+    elif args.watch:
+        if not t.watch():
+            sys.exit(1)
+    elif args.config_file is not None and not execute(t, args):
+        sys.exit(1)
 
 
 if __name__ == "__main__":